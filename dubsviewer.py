@@ -1,52 +1,103 @@
+import os
 import altair as alt
 import numpy as np
 import pandas as pd
 import streamlit as st
-from datetime import datetime, timedelta
-
-# Load CSV
-df = pd.read_csv("leaderboard_data.csv")
-
-df['timestamp'] = pd.to_datetime(df['timestamp'], format="%Y-%m-%d %H:%M:%S")
-df = df.rename(columns={"number_int": "score"})
+from datetime import timedelta
+
+# Load CSV (cached; the file's mtime is part of the key so a rewrite reloads it)
+@st.cache_data(ttl=60)
+def load_leaderboard(path, mtime):
+    df = pd.read_csv(path)
+    df['timestamp'] = pd.to_datetime(df['timestamp'], format="%Y-%m-%d %H:%M:%S", cache=True)
+    # Categorical names let groupby/isin work on integer codes instead of hashing strings
+    df['name'] = df['name'].astype('category')
+    df = df.rename(columns={"number_int": "score"})
+    # Scores fit in int32, which halves the bytes every aggregation over them moves
+    if df['score'].between(0, np.iinfo(np.int32).max).all():
+        df['score'] = df['score'].astype('int32')
+    # Time-ordered rows let time windows be cut with a binary search instead of a mask
+    return df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+data_mtime = os.path.getmtime("leaderboard_data.csv")
+df = load_leaderboard("leaderboard_data.csv", data_mtime)
+
+# Highest score seen per player, shared by the sections that rank players by it
+@st.cache_data(ttl=60)
+def name_max_score(df):
+    return df.groupby("name", observed=True)["score"].max()
 
 st.title("🏆 Top Gainers Leaderboards")
 
 # Optional name filter input
 name_filter = st.text_area("Filter by specific player names (comma or newline separated)", height=100)
-filtered_names = set()
+filtered_names = frozenset()
 if name_filter.strip():
-    filtered_names = set([name.strip() for name in name_filter.replace(",", "\n").split("\n") if name.strip()])
-
-# Function to calculate gain within a time window
-def get_gain_leaderboard(time_window=None):
-    if time_window:
-        cutoff = datetime.now() - time_window
-        df_filtered = df[df['timestamp'] >= cutoff]
-    else:
-        df_filtered = df.copy()
-
-    if filtered_names:
-        df_filtered = df_filtered[df_filtered['name'].isin(filtered_names)]
-
-    counts = df_filtered['name'].value_counts()
-    valid_names = counts[counts > 1].index
-    df_filtered = df_filtered[df_filtered['name'].isin(valid_names)]
-
-    if df_filtered.empty:
+    filtered_names = frozenset(name.strip() for name in name_filter.replace(",", "\n").split("\n") if name.strip())
+
+# Per-player score range and row count for every hour, so leaderboards scan buckets instead of raw rows.
+# Held as a shared read-only resource keyed on the file's mtime: no per-call frame hashing or copying.
+@st.cache_resource(ttl=60)
+def hourly_score_range(_df, mtime):
+    hour = _df['timestamp'].dt.floor('h').rename('hour')
+    buckets = _df.groupby([_df['name'], hour], sort=False, observed=True)['score'].agg(['min', 'max', 'size'])
+    return buckets.reset_index().sort_values('hour', kind='stable').reset_index(drop=True)
+
+# Function to calculate gain within a time window (_df is keyed by its file's mtime instead of being hashed)
+@st.cache_data(ttl=60)
+def get_gain_leaderboard(_df, mtime, cutoff=None, names=frozenset()):
+    df_filtered = hourly_score_range(_df, mtime)
+
+    if cutoff is not None:
+        first_hour = cutoff.ceil('h')
+
+        # Search the raw int64 ticks, converting only the bounds to the column's unit (never the column)
+        ts = _df['timestamp'].values
+        bounds = np.array([cutoff.to_datetime64(), first_hour.to_datetime64()]).astype(ts.dtype).view('i8')
+        start, stop = np.searchsorted(ts.view('i8'), bounds)
+        first_bucket = np.searchsorted(df_filtered['hour'].values.astype(ts.dtype, copy=False).view('i8'), bounds[1])
+
+        # Whole hours come from the buckets; rows in the partial hour before them count as one-row buckets
+        head = _df.iloc[start:stop]
+        df_filtered = pd.concat([
+            pd.DataFrame({'name': head['name'], 'min': head['score'], 'max': head['score'], 'size': 1}),
+            df_filtered.iloc[first_bucket:],
+        ])
+
+    if names:
+        # Match on integer category codes instead of hashing every row's name
+        filter_codes = df_filtered['name'].cat.categories.get_indexer(list(names))
+        df_filtered = df_filtered[np.isin(df_filtered['name'].cat.codes.values, filter_codes[filter_codes >= 0])]
+
+    # Merge the buckets per player directly on the category codes; min/max/count are distributive,
+    # so this gives the exact window range without a pandas groupby
+    # Rows with a missing name have code -1; drop them as a groupby would
+    codes = df_filtered['name'].cat.codes.values
+    named = codes >= 0
+    codes = codes[named]
+    players = df_filtered['name'].cat.categories
+    size = np.bincount(codes, weights=df_filtered['size'].values[named], minlength=len(players))
+    low = np.full(len(players), np.iinfo(np.int64).max)
+    high = np.full(len(players), np.iinfo(np.int64).min)
+    np.minimum.at(low, codes, df_filtered['min'].values[named])
+    np.maximum.at(high, codes, df_filtered['max'].values[named])
+
+    valid = size > 1
+    if not valid.any():
         return pd.DataFrame(columns=["name", "Gain"])
 
-    latest = df_filtered.groupby("name")["score"].max()
-    earliest = df_filtered.groupby("name")["score"].min()
-    gain = (latest - earliest).sort_values(ascending=False)
-    return gain.reset_index().rename(columns={0: "Gain"})
+    gain = pd.DataFrame({"name": players[valid], "Gain": high[valid] - low[valid]})
+    return gain.sort_values(["Gain", "name"], ascending=[False, True]).reset_index(drop=True)
+
+# One reference time per rerun, to the minute, so all windows agree and cached leaderboards get reused
+now = pd.Timestamp.now().floor('min')
 
 # Layout in columns
 col1, col2, col3 = st.columns(3)
 
 with col1:
     st.subheader("Last 24 Hours")
-    df_1d = get_gain_leaderboard(timedelta(days=1))
+    df_1d = get_gain_leaderboard(df, data_mtime, now - timedelta(days=1), filtered_names)
     st.dataframe(df_1d, hide_index=True, column_config={
         "name": st.column_config.TextColumn("Player Name", width="large"),
         "Gain": st.column_config.NumberColumn("Gain", format="%d", width="medium"),
@@ -54,7 +105,7 @@ with col1:
 
 with col2:
     st.subheader("Last 7 Days")
-    df_7d = get_gain_leaderboard(timedelta(days=7))
+    df_7d = get_gain_leaderboard(df, data_mtime, now - timedelta(days=7), filtered_names)
     st.dataframe(df_7d, hide_index=True, column_config={
         "name": st.column_config.TextColumn("Player Name", width="large"),
         "Gain": st.column_config.NumberColumn("Gain", format="%d", width="medium"),
@@ -62,7 +113,7 @@ with col2:
 
 with col3:
     st.subheader("All Time")
-    df_all = get_gain_leaderboard()
+    df_all = get_gain_leaderboard(df, data_mtime, None, filtered_names)
     st.dataframe(df_all, hide_index=True, column_config={
         "name": st.column_config.TextColumn("Player Name", width="large"),
         "Gain": st.column_config.NumberColumn("Gain", format="%d", width="medium"),
@@ -71,9 +122,11 @@ with col3:
 # Optional: Show a bar chart of the top all-time gainers
 st.subheader("📊 All-Time Gainers Chart with Top 3 Labels")
 
-if not df_all.empty and "Gain" in df_all.columns:
+# Function to build the all-time gainers bar chart (cached, so reruns with unchanged data reuse the spec)
+@st.cache_data(ttl=60)
+def build_gainers_chart(df_top):
     # Create base bar chart
-    base = alt.Chart(df_all).mark_bar().encode(
+    base = alt.Chart(df_top).mark_bar().encode(
         x=alt.X('name:N', title="Player", sort='-y'),
         y=alt.Y('Gain:Q', title="Gain")
     )
@@ -93,7 +146,11 @@ if not df_all.empty and "Gain" in df_all.columns:
         text='name'
     )
 
-    chart = (base + text).properties(width=800, height=400)
+    return (base + text).properties(width=800, height=400)
+
+if not df_all.empty and "Gain" in df_all.columns:
+    # Top 50 only; df_all is already sorted by gain
+    chart = build_gainers_chart(df_all.head(50))
     st.altair_chart(chart, use_container_width=True)
 
 else:
@@ -104,7 +161,7 @@ else:
 st.subheader("🕒 Custom Time Range Leaderboard")
 
 custom_hours = st.slider("Select a time range (in hours)", min_value=1, max_value=168, value=12)
-df_custom = get_gain_leaderboard(timedelta(hours=custom_hours))
+df_custom = get_gain_leaderboard(df, data_mtime, now - timedelta(hours=custom_hours), filtered_names)
 
 if not df_custom.empty:
     st.dataframe(df_custom, hide_index=True, column_config={
@@ -117,67 +174,86 @@ else:
 st.subheader("📈 Top 20 Players Progression Over Time (Smoothed)")
 
 # 1. Get top 20 players by max score
-top20_names = df.groupby("name")["score"].max().sort_values(ascending=False).head(20).index.tolist()
+name_max = name_max_score(df)
+top20_names = name_max.nlargest(20).index.tolist()
 
-# 2. Filter dataframe for top 20 only
-df_top20 = df[df["name"].isin(top20_names)]
+# 2. Filter dataframe for top 20 only, sorted per player over time
+df_top20 = df[df["name"].isin(top20_names)].sort_values(["name", "timestamp"])
 
-# 3. Pivot to time series structure
-df_pivot = df_top20.pivot_table(index="timestamp", columns="name", values="score", aggfunc="max")
+# 3. Running max per player, with negative scores (if they exist) clipped to zero
+running_max = df_top20.groupby("name", observed=True)["score"].cummax().clip(lower=0)
 
-# 4. Sort timestamps & forward fill missing data
-df_pivot = df_pivot.sort_index().ffill()
+# 4. Long format for Altair, one row per observation
+df_long = pd.DataFrame({
+    "timestamp": df_top20["timestamp"],
+    "Player": df_top20["name"].cat.remove_unused_categories(),
+    "Score": running_max,
+})
 
-# 5. Remove negative or zero scores (if they exist)
-df_pivot[df_pivot < 0] = 0
+# 5. Optionally downsample to the max per player per time bucket, so fewer points are sent to the browser
+#    (the top 20 are sampled sparsely, so only buckets of several hours shrink the payload)
+chart_bucket = st.select_slider("Chart resolution", options=["Raw", "6h", "12h", "1D"], value="Raw")
+if chart_bucket != "Raw":
+    df_long = (
+        df_long.groupby(["Player", df_long["timestamp"].dt.floor(chart_bucket)], observed=True)["Score"]
+        .max()
+        .reset_index()
+    )
 
-# 6. Melt for Altair
-df_long = df_pivot.reset_index().melt(id_vars=["timestamp"], var_name="Player", value_name="Score")
+# 6. Carry each player's final score to the newest snapshot so every line ends at the same time
+newest = df["timestamp"].max()
+final_points = df_long.groupby("Player", observed=True).tail(1)
+final_points = final_points[final_points["timestamp"] < newest].assign(timestamp=newest)
+df_long = pd.concat([df_long, final_points], ignore_index=True)
 
 # # Get top 3 players
 # top3_names = df.groupby("name")["score"].max().sort_values(ascending=False).head(3).index.tolist()
 
 # Smooth line chart
 # Get top 5 players
-top5_names = df.groupby("name")["score"].max().sort_values(ascending=False).head(5).index.tolist()
-
-# Smooth line chart base
-base_chart = alt.Chart(df_long).mark_line(interpolate='monotone').encode(
-    x=alt.X('timestamp:T', title="Time"),
-    y=alt.Y('Score:Q', scale=alt.Scale(zero=True), title="Dubs"),
-    color=alt.Color('Player:N', legend=alt.Legend(title="Player"))
-)
+top5_names = name_max.nlargest(5).index.tolist()
 
 # Latest points of top 5
-latest_points = df_long[df_long['Player'].isin(top5_names)].sort_values('timestamp').groupby('Player').tail(1)
-
-# Text labels for top 5 (WITH proper padding inside chart)
-text_labels = alt.Chart(latest_points).mark_text(
-    align='right',
-    dx=5,     # small nudge right
-    dy=-5,    # small nudge up
-    fontSize=12,
-    fontWeight='bold'
-).encode(
-    x='timestamp:T',
-    y='Score:Q',
-    text='Player',
-    color='Player:N'
-)
-
-# Compose chart (without clipping)
-chart = (base_chart + text_labels).properties(
-    width=850,
-    height=500,
-    title="Top 20 Player Progression (Smooth) with Top 5 Labels"
-).configure_legend(
-    orient='right',       # move legend to right
-    padding=20,           # add padding
-    labelLimit=200
-).configure_view(
-    stroke=None           # remove the outer border
-)
+latest_points = df_long[df_long['Player'].isin(top5_names)].sort_values('timestamp').groupby('Player', observed=True).tail(1)
+
+# Function to build the progression chart (cached, so reruns with unchanged data reuse the spec)
+@st.cache_data(ttl=60)
+def build_progression_chart(df_long, latest_points):
+    # Smooth line chart base
+    base_chart = alt.Chart(df_long).mark_line(interpolate='monotone').encode(
+        x=alt.X('timestamp:T', title="Time"),
+        y=alt.Y('Score:Q', scale=alt.Scale(zero=True), title="Dubs"),
+        color=alt.Color('Player:N', legend=alt.Legend(title="Player"))
+    )
+
+    # Text labels for top 5 (WITH proper padding inside chart)
+    text_labels = alt.Chart(latest_points).mark_text(
+        align='right',
+        dx=5,     # small nudge right
+        dy=-5,    # small nudge up
+        fontSize=12,
+        fontWeight='bold'
+    ).encode(
+        x='timestamp:T',
+        y='Score:Q',
+        text='Player',
+        color='Player:N'
+    )
 
+    # Compose chart (without clipping)
+    return (base_chart + text_labels).properties(
+        width=850,
+        height=500,
+        title="Top 20 Player Progression (Smooth) with Top 5 Labels"
+    ).configure_legend(
+        orient='right',       # move legend to right
+        padding=20,           # add padding
+        labelLimit=200
+    ).configure_view(
+        stroke=None           # remove the outer border
+    )
+
+chart = build_progression_chart(df_long, latest_points)
 st.altair_chart(chart, use_container_width=True)
 
 
@@ -187,24 +263,67 @@ st.subheader("💥 Biggest Gain Detected Over Rolling Time Window (All Players)"
 
 rolling_hours = st.slider("Select rolling window (hours):", min_value=1, max_value=24, value=4)
 
-biggest_changes = []
-
-for player, group in df.groupby('name'):
-    group = group.sort_values('timestamp')
-
-    max_gain = 0
-
-    for i, row in group.iterrows():
-        window_end = row['timestamp'] + timedelta(hours=rolling_hours)
-        future_window = group[(group['timestamp'] > row['timestamp']) & (group['timestamp'] <= window_end)]
-
-        if not future_window.empty:
-            gain = future_window['score'].max() - row['score']
-            if gain > max_gain:
-                max_gain = gain
-
-    if max_gain > 0:
-        biggest_changes.append({'name': player, 'max_gain': int(max_gain)})
+# Function to take the max of sc over many non-empty [start, end) slices at once
+def range_max(sc, starts, ends):
+    lengths = ends - starts
+
+    # Sparse table: levels[k][j] is the max of sc[j:j + 2**k]
+    levels = [sc]
+    while (1 << len(levels)) <= lengths.max():
+        step = 1 << (len(levels) - 1)
+        levels.append(np.maximum(levels[-1][:-step], levels[-1][step:]))
+
+    # Any slice is covered by two overlapping power-of-two blocks
+    k = np.frexp(lengths)[1] - 1
+    window_max = np.empty(len(starts), dtype=sc.dtype)
+    for level, table in enumerate(levels):
+        rows = k == level
+        if rows.any():
+            window_max[rows] = np.maximum(table[starts[rows]], table[ends[rows] - (1 << level)])
+
+    return window_max
+
+# Function to find each player's biggest gain within a rolling time window
+# (_df is keyed by its file's mtime instead of being hashed)
+@st.cache_data(ttl=60)
+def get_biggest_gains(_df, mtime, rolling_hours):
+    # Rows without a name are not a player (groupby('name') skipped them too)
+    df = _df[_df['name'].notna()]
+    if df.empty:
+        return []
+
+    window_ns = rolling_hours * 3600 * 10**9
+
+    # One (name, timestamp) sort so every player is a contiguous run of rows
+    df_sorted = df.sort_values(['name', 'timestamp'])
+    codes = df_sorted['name'].cat.codes.values
+    ts = df_sorted['timestamp'].values.astype('datetime64[ns]').view('i8')
+    sc = df_sorted['score'].values
+
+    group_starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+
+    # Rank timestamps and window ends against the distinct timestamps, so (player, rank) packs into
+    # one small int64 key that is sorted like the rows and cannot overflow. This relies on every
+    # code being >= 0: a missing name (code -1) would sort last but pack below every real player.
+    times = np.unique(ts)
+    stride = len(times) + 1
+    key = codes.astype(np.int64) * stride + np.searchsorted(times, ts, side='right')
+    end_key = codes.astype(np.int64) * stride + np.searchsorted(times, ts + window_ns, side='right')
+
+    # Each row's window covers the same player's rows strictly after it, up to rolling_hours later
+    starts = np.searchsorted(key, key, side='right')
+    ends = np.searchsorted(key, end_key, side='right')
+
+    has_window = ends > starts
+    gains = np.zeros(len(sc), dtype=sc.dtype)
+    if has_window.any():
+        gains[has_window] = range_max(sc, starts[has_window], ends[has_window]) - sc[has_window]
+
+    max_gains = np.maximum.reduceat(gains, group_starts)
+    names = df_sorted['name'].values[group_starts]
+    return [{'name': name, 'max_gain': int(gain)} for name, gain in zip(names, max_gains) if gain > 0]
+
+biggest_changes = get_biggest_gains(df, data_mtime, rolling_hours)
 
 # Display
 if biggest_changes:
@@ -218,23 +337,22 @@ else:
 st.subheader("GG Seasonal Leaderboard")
 
 # Load from file
+@st.cache_data(ttl=60)
+def load_selected_users(path, mtime):
+    with open(path, "r") as f:
+        return [line.strip() for line in f if line.strip()]
+
 try:
-    with open("selected_users.txt", "r") as f:
-        selected_users = [line.strip() for line in f if line.strip()]
+    selected_users = load_selected_users("selected_users.txt", os.path.getmtime("selected_users.txt"))
 except FileNotFoundError:
     st.error("❌ 'selected_users.txt' not found. Please add it to the working directory.")
     selected_users = []
 
-# Filter and process
-df_selected = df[df['name'].isin(selected_users)]
-max_scores = df_selected.groupby("name")["score"].max().reset_index()
-
-# Ensure the score column is numeric and drop any bad rows
-max_scores["score"] = pd.to_numeric(max_scores["score"], errors="coerce")
-max_scores = max_scores.dropna(subset=["score"])
+# Look up each selected user's best score from the per-player maxima
+max_scores = name_max_score(df).reindex(list(dict.fromkeys(selected_users))).dropna()
 
 # 🔒 Force type to int64 — critical to prevent exclamation warning
-max_scores["score"] = max_scores["score"].astype("int64")
+max_scores = max_scores.astype("int64").rename_axis("name").reset_index()
 max_scores["score_formatted"] = max_scores["score"].apply(lambda x: f"{x:,}")
 
 